@@ -0,0 +1,143 @@
+import asyncio
+import math
+import re
+import time
+from collections import OrderedDict
+
+from fastjson import dumps
+
+
+# ---------------- Priority classes ----------------
+class PriorityClass:
+    # A group of routes sharing one concurrency limit, queue budget and
+    # per-client token bucket. Routes are regexes matched against
+    # "METHOD /path"; the first class that matches a request wins.
+    def __init__(self, name, routes, max_concurrency=None, queue_budget=1.0, rate=None, burst=None):
+        self.name = name
+        self.routes = [re.compile(r) for r in routes]
+        self.max_concurrency = max_concurrency
+        self.queue_budget = queue_budget
+        self.rate = rate
+        self.burst = burst if burst is not None else (max(1, math.ceil(rate)) if rate else None)
+
+    def matches(self, target: str) -> bool:
+        return any(r.match(target) for r in self.routes)
+
+
+DEFAULT_CLASS = PriorityClass("default", [r".*"])
+
+
+class _Gate:
+    def __init__(self, cls: PriorityClass):
+        self.cls = cls
+        self.slots = asyncio.Semaphore(cls.max_concurrency) if cls.max_concurrency else None
+        self.buckets = OrderedDict()
+        self.waiting = 0
+        self.active = 0
+        self.service_time = 0.0
+        self.admitted = 0
+        self.shed = 0
+        self.throttled = 0
+
+    def take_token(self, client: str, max_clients: int) -> float:
+        # Returns 0 when a token was taken, otherwise seconds until one is free.
+        now = time.monotonic()
+        tokens, updated = self.buckets.pop(client, (self.cls.burst, now))
+        tokens = min(self.cls.burst, tokens + (now - updated) * self.cls.rate)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / self.cls.rate
+        self.buckets[client] = (tokens, now)
+        if len(self.buckets) > max_clients:
+            self.buckets.popitem(last=False)
+        return wait
+
+    def expected_wait(self) -> float:
+        return self.waiting / self.cls.max_concurrency * self.service_time
+
+    def record(self, elapsed: float):
+        # Exponentially weighted service time, used to shed before queueing.
+        self.service_time = elapsed if not self.service_time else 0.8 * self.service_time + 0.2 * elapsed
+
+    def stats(self) -> dict:
+        return {
+            "admitted": self.admitted,
+            "shed": self.shed,
+            "throttled": self.throttled,
+            "active": self.active,
+            "waiting": self.waiting,
+            "service_time_ms": round(self.service_time * 1000, 3),
+        }
+
+
+# ---------------- Middleware ----------------
+class AdmissionControl:
+    def __init__(self, app, classes=(), stats_path="/_admission", max_clients=10000, stats_sources=None):
+        self.app = app
+        self.gates = [_Gate(c) for c in (*classes, DEFAULT_CLASS)]
+        self.stats_path = stats_path
+        # Other per-process components whose stats() are served on stats_path.
+        self.stats_sources = stats_sources or {}
+        self.max_clients = max_clients
+
+    def classify(self, method: str, path: str) -> _Gate:
+        target = f"{method} {path}"
+        for gate in self.gates:
+            if gate.cls.matches(target):
+                return gate
+
+    def stats(self) -> dict:
+        stats = {gate.cls.name: gate.stats() for gate in self.gates}
+        for name, source in self.stats_sources.items():
+            stats[name] = source()
+        return stats
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        if scope["path"] == self.stats_path:
+            return await _respond(send, 200, self.stats())
+
+        gate = self.classify(scope["method"], scope["path"])
+        if gate.cls.rate:
+            client = (scope.get("client") or ("-",))[0]
+            wait = gate.take_token(client, self.max_clients)
+            if wait:
+                gate.throttled += 1
+                return await _respond(send, 429, {"detail": "Too many requests"}, retry_after=wait)
+
+        if gate.slots is not None:
+            budget = gate.cls.queue_budget
+            if gate.slots.locked() and gate.expected_wait() > budget:
+                gate.shed += 1
+                return await _respond(send, 503, {"detail": "Server overloaded"}, retry_after=gate.expected_wait())
+            gate.waiting += 1
+            try:
+                await asyncio.wait_for(gate.slots.acquire(), budget)
+            except asyncio.TimeoutError:
+                gate.shed += 1
+                return await _respond(send, 503, {"detail": "Server overloaded"}, retry_after=budget)
+            finally:
+                gate.waiting -= 1
+
+        gate.admitted += 1
+        gate.active += 1
+        start = time.monotonic()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            gate.active -= 1
+            gate.record(time.monotonic() - start)
+            if gate.slots is not None:
+                gate.slots.release()
+
+
+async def _respond(send, status: int, content: dict, retry_after: float = None):
+    body = dumps(content)
+    headers = [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+    if retry_after is not None:
+        headers.append((b"retry-after", str(max(1, math.ceil(retry_after))).encode()))
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,51 @@
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import repository as repo
+from models import Base, Register
+
+# Runs against in-memory SQLite so the numbers are dominated by the Python
+# side of each lookup: building the query, compiling it and binding values.
+USERS = 1_000
+CALLS = 20_000
+
+
+def legacy_by_email(db, email):
+    return db.query(Register).filter(Register.email == email).first()
+
+
+def legacy_by_id(db, user_id):
+    return db.query(Register).filter(Register.user_id == user_id).first()
+
+
+def bench(name, fn, db, keys):
+    start = time.perf_counter()
+    for i in range(CALLS):
+        fn(db, keys[i % len(keys)])
+    elapsed = time.perf_counter() - start
+    per_call = elapsed / CALLS * 1e6
+    print(f"{name:<22} {per_call:>8.1f} us/call")
+    return per_call
+
+
+if __name__ == "__main__":
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    db.add_all(Register(name=f"user{i}", email=f"user{i}@example.com", password="x") for i in range(USERS))
+    db.commit()
+    emails = [f"user{i}@example.com" for i in range(USERS)]
+    ids = list(range(1, USERS + 1))
+
+    for label, legacy, cached, keys in (
+        ("by email", legacy_by_email, repo.register_by_email, emails),
+        ("by id", legacy_by_id, repo.register_by_id, ids),
+    ):
+        # Warm both paths so the compiled cache is populated before timing.
+        legacy(db, keys[0])
+        cached(db, keys[0])
+        old = bench(f"legacy query {label}", legacy, db, keys)
+        new = bench(f"cached stmt {label}", cached, db, keys)
+        print(f"{'saved':<22} {old - new:>8.1f} us/call ({old / new:.2f}x)")
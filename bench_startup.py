@@ -0,0 +1,80 @@
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+# Each app is measured in a fresh interpreter so the numbers reflect a cold
+# worker: module import, the startup hooks (the schema version check), then
+# one request sent straight to the ASGI app, which also builds the middleware
+# stack on first use.
+CHILD = """
+import asyncio, time
+start = time.perf_counter()
+import {module} as app_module
+imported = time.perf_counter()
+for hook in app_module.app.router.on_startup:
+    hook()
+ready = time.perf_counter()
+
+async def first_request():
+    async def receive():
+        return {{"type": "http.request", "body": b"", "more_body": False}}
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status.append(message["status"])
+    scope = {{"type": "http", "asgi": {{"version": "3.0"}}, "http_version": "1.1", "method": "GET", "scheme": "http",
+             "path": {path!r}, "raw_path": {path!r}.encode(), "query_string": b"", "root_path": "",
+             "headers": [(b"host", b"bench")], "client": ("127.0.0.1", 0), "server": ("bench", 80)}}
+    await app_module.app(scope, receive, send)
+
+status = []
+asyncio.run(first_request())
+served = time.perf_counter()
+print(f"{{(imported - start) * 1000:.1f}} {{(ready - imported) * 1000:.1f}} {{(served - ready) * 1000:.1f}} {{status[0]}} {{time.time():.6f}}")
+"""
+
+
+def _parse(stdout):
+    # The timings are the last line, after anything the app logs on stdout.
+    import_ms, startup_ms, request_ms, status, finished = stdout.strip().splitlines()[-1].split()
+    return float(import_ms), float(startup_ms), float(request_ms), int(status), float(finished)
+
+
+def measure(module, path):
+    out = subprocess.run([sys.executable, "-c", CHILD.format(module=module, path=path)], capture_output=True, text=True)
+    if out.returncode:
+        raise RuntimeError(f"worker for {module} failed:\n{out.stderr}")
+    return _parse(out.stdout)
+
+
+def measure_concurrent(module, path, workers):
+    # Starts all workers at once, like a rolling restart of one host, and
+    # times each from launch until it has served its first request.
+    launched = time.time()
+    procs = [subprocess.Popen([sys.executable, "-c", CHILD.format(module=module, path=path)], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+             for _ in range(workers)]
+    ready_ms = []
+    for proc in procs:
+        stdout, stderr = proc.communicate()
+        if proc.returncode:
+            raise RuntimeError(f"worker for {module} failed:\n{stderr}")
+        ready_ms.append((_parse(stdout)[-1] - launched) * 1000)
+    return ready_ms
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure cold start to first request for the apps")
+    parser.add_argument("modules", nargs="*", default=["main", "main1", "main2"])
+    parser.add_argument("--workers", type=int, default=32, help="workers started at once per app; 0 skips the concurrent run")
+    parser.add_argument("--path", default="/_admission", help="first request path, e.g. one that queries the database")
+    args = parser.parse_args()
+
+    for module in args.modules:
+        import_ms, startup_ms, request_ms, status, _ = measure(module, args.path)
+        print(f"{module:<6} import {import_ms:>8.1f} ms  startup {startup_ms:>8.1f} ms  first request {request_ms:>8.1f} ms ({status})"
+              f"  total {import_ms + startup_ms + request_ms:>8.1f} ms")
+        if args.workers:
+            ready_ms = measure_concurrent(module, args.path, args.workers)
+            print(f"{module:<6} {args.workers} workers: all served after {max(ready_ms):>8.1f} ms  median {statistics.median(ready_ms):>8.1f} ms")
+    print("per-module import breakdown: python -X importtime -c 'import main'")
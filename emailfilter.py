@@ -0,0 +1,189 @@
+import hashlib
+import logging
+import math
+import os
+import random
+import threading
+
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+
+logger = logging.getLogger("emailfilter")
+
+# ---------------- Configuration ----------------
+EMAIL_FILTER_FP_RATE = float(os.getenv("EMAIL_FILTER_FP_RATE", "0.01"))
+EMAIL_FILTER_REBUILD_INTERVAL = float(os.getenv("EMAIL_FILTER_REBUILD_INTERVAL", "300"))
+# Workers started together would otherwise scan the email table in lockstep.
+# The first build waits a random 0..START_JITTER seconds (lookups fall through
+# to the database meanwhile) and each rebuild interval varies by +/- JITTER.
+EMAIL_FILTER_START_JITTER = float(os.getenv("EMAIL_FILTER_START_JITTER", "30"))
+EMAIL_FILTER_JITTER = 0.2
+# Sized for this multiple of the current row count so signups between
+# rebuilds do not push the false-positive rate past the target.
+EMAIL_FILTER_HEADROOM = 2
+EMAIL_FILTER_MIN_CAPACITY = 1024
+
+
+# ---------------- Bloom filter ----------------
+class BloomFilter:
+    def __init__(self, capacity: int, fp_rate: float):
+        self.capacity = max(capacity, 1)
+        self.size = max(8, math.ceil(-self.capacity * math.log(fp_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str):
+        # Double hashing over one 128-bit digest.
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, key: str):
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.bits)
+
+
+# ---------------- Email filter ----------------
+class EmailFilter:
+    # In-process filter over one email column. A miss means the email is
+    # definitely not registered, so the lookup can be skipped. Until the
+    # first build finishes every email is treated as a possible hit.
+    #
+    # Signups handled by other workers only reach this filter on the next
+    # rebuild, so a miss is not proof for a login; signup paths rely on the
+    # unique constraint for that window.
+    def __init__(self, session_factory, column, fp_rate=EMAIL_FILTER_FP_RATE, rebuild_interval=EMAIL_FILTER_REBUILD_INTERVAL):
+        self.session_factory = session_factory
+        self.column = column
+        self.fp_rate = fp_rate
+        self.rebuild_interval = rebuild_interval
+        self.filter = None
+        self.lock = threading.Lock()
+        self.rebuild_lock = threading.Lock()
+        self.pending = None
+        self.growing = False
+        self.stop = threading.Event()
+        self.checks = 0
+        self.avoided = 0
+        self.false_positives = 0
+
+    def rebuild(self):
+        with self.rebuild_lock:
+            with self.lock:
+                self.pending = []
+            db = self.session_factory()
+            try:
+                total = db.execute(select(func.count()).select_from(self.column.table)).scalar()
+                bloom = BloomFilter(max(total * EMAIL_FILTER_HEADROOM, EMAIL_FILTER_MIN_CAPACITY), self.fp_rate)
+                for email in db.execute(select(self.column).execution_options(yield_per=10_000)).scalars():
+                    bloom.add(email)
+            finally:
+                db.close()
+            with self.lock:
+                # Signups committed while the table was being read are
+                # replayed into the new filter before it is swapped in.
+                for email in self.pending:
+                    bloom.add(email)
+                self.pending = None
+                self.filter = bloom
+                self.growing = False
+        logger.info("email filter for %s rebuilt: %s", self.column, self.stats())
+
+    def add(self, email: str):
+        # Call after the signup commits, so a rebuild that starts later
+        # already sees the row.
+        grow = False
+        with self.lock:
+            if self.pending is not None:
+                self.pending.append(email)
+            if self.filter is not None:
+                self.filter.add(email)
+                grow = self.filter.count > self.filter.capacity and not self.growing
+                self.growing = self.growing or grow
+        if grow:
+            threading.Thread(target=self._rebuild_logged, daemon=True).start()
+
+    def commit_signup(self, db, email: str) -> bool:
+        # Commits a new row holding email. Returns False if the email was
+        # registered by another worker since this filter was last rebuilt;
+        # any other integrity error is raised unchanged.
+        try:
+            db.commit()
+        except IntegrityError as e:
+            db.rollback()
+            if self._duplicate_email(e):
+                return False
+            raise
+        self.add(email)
+        return True
+
+    def _duplicate_email(self, error: IntegrityError) -> bool:
+        # Postgres names the default unique constraint in its message
+        # (users_email_key), SQLite names the column (users.email).
+        table, column = self.column.table.name, self.column.name
+        message = str(error.orig)
+        return f"{table}_{column}_key" in message or f"{table}.{column}" in message
+
+    def might_exist(self, email: str) -> bool:
+        bloom = self.filter
+        return bloom is None or email in bloom
+
+    def lookup(self, fetch, db, email: str):
+        # fetch(db, email) is only called when the filter cannot rule the
+        # email out. Counters are shared by the threadpool threads.
+        built = self.filter is not None
+        if not self.might_exist(email):
+            with self.lock:
+                self.checks += 1
+                self.avoided += 1
+            return None
+        found = fetch(db, email)
+        with self.lock:
+            self.checks += 1
+            if found is None and built:
+                self.false_positives += 1
+        return found
+
+    def stats(self) -> dict:
+        with self.lock:
+            bloom = self.filter
+            checks, avoided, false_positives = self.checks, self.avoided, self.false_positives
+        return {
+            "items": bloom.count if bloom else 0,
+            "bits": bloom.size if bloom else 0,
+            "hashes": bloom.hashes if bloom else 0,
+            "memory_bytes": bloom.nbytes if bloom else 0,
+            "checks": checks,
+            "db_hits_avoided": avoided,
+            "false_positives": false_positives,
+            "measured_fp_rate": round(false_positives / (false_positives + avoided), 5) if false_positives + avoided else 0.0,
+            "db_lookups": checks - avoided,
+        }
+
+    def _rebuild_logged(self):
+        try:
+            self.rebuild()
+        except Exception:
+            logger.exception("email filter rebuild failed")
+
+    def _run(self):
+        if self.stop.wait(random.uniform(0, EMAIL_FILTER_START_JITTER)):
+            return
+        while not self.stop.is_set():
+            self._rebuild_logged()
+            self.stop.wait(self.rebuild_interval * random.uniform(1 - EMAIL_FILTER_JITTER, 1 + EMAIL_FILTER_JITTER))
+
+    def start(self) -> threading.Thread:
+        worker = threading.Thread(target=self._run, name="email-filter", daemon=True)
+        worker.start()
+        return worker
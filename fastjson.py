@@ -0,0 +1,55 @@
+import os
+from typing import Any, Iterable, Sequence
+
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - falls back to the stdlib encoder
+    orjson = None
+    import json
+
+# ---------------- Configuration ----------------
+# "fast" returns plain column tuples encoded with orjson, "orm" keeps the
+# per-row orm_mode validation through the route's response_model.
+SERIALIZATION_MODE = os.getenv("SERIALIZATION_MODE", "fast")
+
+
+def fast_mode() -> bool:
+    return SERIALIZATION_MODE == "fast"
+
+
+# ---------------- Encoder ----------------
+def _default(obj: Any):
+    if hasattr(obj, "isoformat"):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=_default)
+    return json.dumps(content, default=_default, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+# ---------------- Row helpers ----------------
+def rows_to_dicts(fields: Sequence[str], rows: Iterable[Sequence[Any]]) -> list:
+    return [dict(zip(fields, row)) for row in rows]
+
+
+def rows_response(fields: Sequence[str], rows: Iterable[Sequence[Any]]) -> FastJSONResponse:
+    return FastJSONResponse(rows_to_dicts(fields, rows))
+
+
+def query_rows(db, model, schema):
+    # Select only the columns named by the response schema, in schema order,
+    # so the encoded rows have the same shape as the orm_mode path.
+    fields = tuple(schema.__fields__)
+    return fields, db.query(*(getattr(model, f) for f in fields)).all()
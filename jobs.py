@@ -0,0 +1,157 @@
+import argparse
+import importlib
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import Column, DateTime, Integer, String, Text, select, update
+from sqlalchemy.orm import declarative_base
+
+logger = logging.getLogger("jobs")
+
+# ---------------- Configuration ----------------
+# "inline" runs a worker thread inside each app process, "external" leaves
+# the queue to `python jobs.py --app <module>`.
+JOB_WORKER = os.getenv("JOB_WORKER", "inline")
+POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1.0"))
+CLAIM_SIZE = 20
+MAX_ATTEMPTS = 5
+# A claimed job not finished within this many seconds is run again.
+LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "300"))
+# Rows touched per statement by tasks that delete in bulk.
+BATCH_SIZE = 500
+
+Base = declarative_base()
+
+
+# ---------------- Model ----------------
+class Job(Base):
+    __tablename__ = "jobs"
+    id = Column(Integer, primary_key=True)
+    task = Column(String(200), nullable=False)
+    payload = Column(Text, nullable=False)
+    status = Column(String(20), nullable=False, default="pending", index=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    run_after = Column(DateTime, nullable=False, default=datetime.utcnow)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+
+# ---------------- Tasks ----------------
+# Tasks must be idempotent: a job can run again after a crash or a failed
+# attempt. Each task is called as fn(db, **payload).
+TASKS = {}
+
+
+def task(fn):
+    TASKS[f"{fn.__module__}.{fn.__name__}"] = fn
+    return fn
+
+
+def enqueue(db, fn, **payload):
+    # Added to the caller's session so the job commits atomically with the
+    # change that caused it.
+    db.add(Job(task=f"{fn.__module__}.{fn.__name__}", payload=json.dumps(payload)))
+
+
+def batched(items, size=BATCH_SIZE):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+# ---------------- Worker ----------------
+def _claim(session_factory, limit: int):
+    # Short transaction: lease a batch of due jobs and commit, so no lock is
+    # held while the tasks run. A job left "running" by a crashed worker is
+    # picked up again once its lease expires.
+    db = session_factory()
+    try:
+        now = datetime.utcnow()
+        claimed = db.execute(
+            select(Job)
+            .where(Job.status.in_(("pending", "running")), Job.run_after <= now, Job.task.in_(list(TASKS)))
+            .order_by(Job.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        ).scalars().all()
+        leased = []
+        for job in claimed:
+            if job.attempts >= MAX_ATTEMPTS:
+                job.status = "failed"
+                continue
+            job.status = "running"
+            job.attempts += 1
+            job.run_after = now + timedelta(seconds=LEASE_SECONDS)
+            leased.append((job.id, job.task, job.payload, job.attempts))
+        db.commit()
+        return leased
+    finally:
+        db.close()
+
+
+def _record(session_factory, job_id: int, **values):
+    db = session_factory()
+    try:
+        db.execute(update(Job).where(Job.id == job_id).values(**values))
+        db.commit()
+    finally:
+        db.close()
+
+
+def _run(session_factory, name: str, payload: str):
+    db = session_factory()
+    try:
+        TASKS[name](db, **json.loads(payload))
+        db.commit()
+    finally:
+        db.close()
+
+
+def run_pending(session_factory, limit: int = CLAIM_SIZE) -> int:
+    leased = _claim(session_factory, limit)
+    for job_id, name, payload, attempts in leased:
+        # Each task runs in its own session and its outcome is recorded in a
+        # separate short transaction.
+        try:
+            _run(session_factory, name, payload)
+        except Exception as e:
+            if attempts >= MAX_ATTEMPTS:
+                logger.exception("job %s (%s) failed permanently", job_id, name)
+                _record(session_factory, job_id, status="failed", last_error=repr(e))
+            else:
+                logger.warning("job %s (%s) failed, retry %s: %r", job_id, name, attempts, e)
+                _record(session_factory, job_id, status="pending", last_error=repr(e),
+                        run_after=datetime.utcnow() + timedelta(seconds=2 ** attempts))
+        else:
+            _record(session_factory, job_id, status="done")
+    return len(leased)
+
+
+def work(session_factory, interval: float = POLL_INTERVAL, stop: threading.Event = None):
+    stop = stop or threading.Event()
+    while not stop.is_set():
+        try:
+            if run_pending(session_factory):
+                continue
+        except Exception:
+            logger.exception("job worker poll failed")
+        stop.wait(interval)
+
+
+def start_worker(session_factory) -> threading.Thread:
+    worker = threading.Thread(target=work, args=(session_factory,), name="job-worker", daemon=True)
+    worker.start()
+    return worker
+
+
+# ---------------- Command ----------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run background jobs for an app")
+    parser.add_argument("--app", required=True, help="app module whose tasks to run, e.g. main or main2")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    app_module = importlib.import_module(args.app)
+    work(app_module.SessionLocal)
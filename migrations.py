@@ -0,0 +1,182 @@
+import argparse
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, Text, create_engine, exc, func, inspect, select, text
+
+from database import DATABASE_URL
+
+# ---------------- Configuration ----------------
+# Arbitrary key for the Postgres advisory lock held while migrating.
+MIGRATION_LOCK_KEY = 727_001
+
+# ---------------- Version table ----------------
+metadata = MetaData()
+
+schema_version = Table(
+    "schema_version",
+    metadata,
+    Column("version", Integer, primary_key=True),
+    Column("description", String(200), nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+# ---------------- Migrations ----------------
+# Each migration is a frozen snapshot of one schema change. Never edit an
+# existing migration or build one from the current models; add a new one.
+def _table(conn, name, *columns):
+    Table(name, MetaData(), *columns).create(bind=conn, checkfirst=True)
+
+
+def _initial_tables(conn):
+    # The tables as they stood before schema versioning. checkfirst lets a
+    # database created by the old create_all on startup adopt version 1.
+    _table(conn, "users",
+           Column("id", Integer, primary_key=True),
+           Column("username", String(150), nullable=False),
+           Column("email", String(255), nullable=False, unique=True),
+           Column("password", String(255), nullable=False))
+    _table(conn, "posts",
+           Column("id", Integer, primary_key=True),
+           Column("user_id", Integer, nullable=False),
+           Column("title", String(300), nullable=True),
+           Column("content", String(2000), nullable=True))
+    _table(conn, "follows",
+           Column("id", Integer, primary_key=True),
+           Column("followed_by", Integer, nullable=False),
+           Column("followed_to", Integer, nullable=False))
+    _table(conn, "blocks",
+           Column("id", Integer, primary_key=True),
+           Column("block_by", Integer, nullable=False),
+           Column("block_to", Integer, nullable=False))
+    _table(conn, "likes",
+           Column("id", Integer, primary_key=True),
+           Column("user_id", Integer, nullable=False),
+           Column("post_id", Integer, nullable=False))
+    _table(conn, "UserRegister",
+           Column("user_id", Integer, primary_key=True),
+           Column("name", String(100), nullable=False),
+           Column("email", String(200), nullable=False, unique=True),
+           Column("password", String(255), nullable=False),
+           Column("otp", Integer, nullable=True))
+    _table(conn, "PostUser",
+           Column("post_id", Integer, primary_key=True),
+           Column("user_id", Integer, nullable=False),
+           Column("title", String(1000), nullable=False),
+           Column("content", String(500), nullable=False))
+    _table(conn, "FollowUser",
+           Column("follow_id", Integer, primary_key=True),
+           Column("follow_by", Integer, nullable=False),
+           Column("follow_to", Integer, nullable=False))
+    _table(conn, "BlockUser",
+           Column("block_id", Integer, primary_key=True),
+           Column("block_by", Integer, nullable=False),
+           Column("block_to", Integer, nullable=False))
+    _table(conn, "LikeUser",
+           Column("like_id", Integer, primary_key=True),
+           Column("like_by", Integer, nullable=False),
+           Column("like_to", Integer, nullable=False))
+
+
+def _created_at_columns(conn):
+    # Databases created by create_all on startup between the created_at
+    # model change and schema versioning may already have the column.
+    columns = {table: {c["name"] for c in inspect(conn).get_columns(table)} for table in ("users", "posts")}
+    for table, names in columns.items():
+        if "created_at" in names:
+            continue
+        # NOT NULL to match the models, applied once existing rows are filled.
+        if conn.dialect.name == "sqlite":
+            # SQLite cannot alter a column later, and NOT NULL on an added
+            # column needs a constant default.
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN created_at TIMESTAMP NOT NULL DEFAULT '1970-01-01 00:00:00'"))
+            conn.execute(text(f"UPDATE {table} SET created_at = CURRENT_TIMESTAMP"))
+        else:
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN created_at TIMESTAMP"))
+            conn.execute(text(f"UPDATE {table} SET created_at = CURRENT_TIMESTAMP"))
+            conn.execute(text(f"ALTER TABLE {table} ALTER COLUMN created_at SET NOT NULL"))
+
+
+def _jobs_table(conn):
+    _table(conn, "jobs",
+           Column("id", Integer, primary_key=True),
+           Column("task", String(200), nullable=False),
+           Column("payload", Text, nullable=False),
+           Column("status", String(20), nullable=False, index=True),
+           Column("attempts", Integer, nullable=False),
+           Column("run_after", DateTime, nullable=False),
+           Column("last_error", Text, nullable=True),
+           Column("created_at", DateTime, nullable=False))
+
+
+def _otp_table(conn):
+    _table(conn, "otpdata",
+           Column("id", Integer, primary_key=True),
+           Column("email", String(), nullable=False),
+           Column("otp", Integer, nullable=False))
+
+
+MIGRATIONS = [
+    (1, "initial tables", _initial_tables),
+    (2, "created_at on users and posts", _created_at_columns),
+    (3, "background jobs", _jobs_table),
+    (4, "otpdata table", _otp_table),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+# ---------------- Helpers ----------------
+def current_version(conn) -> int:
+    return conn.execute(select(func.max(schema_version.c.version))).scalar() or 0
+
+
+def _lock(conn):
+    if conn.dialect.name == "postgresql":
+        conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+
+
+def upgrade(engine):
+    for version, description, migrate in MIGRATIONS:
+        with engine.begin() as conn:
+            _lock(conn)
+            # Created under the lock, so concurrent runs cannot both pass the
+            # existence check and collide on CREATE TABLE.
+            schema_version.create(bind=conn, checkfirst=True)
+            if version <= current_version(conn):
+                continue
+            migrate(conn)
+            conn.execute(schema_version.insert().values(version=version, description=description, applied_at=datetime.utcnow()))
+        print(f"applied {version}: {description}")
+
+
+def check_schema(engine):
+    # The only database work done at app startup: one query, no reflection.
+    try:
+        with engine.connect() as conn:
+            version = current_version(conn)
+    except (exc.ProgrammingError, exc.OperationalError):
+        # Only a missing version table means "not migrated"; connection and
+        # auth failures (or a failed has_table check) surface unchanged.
+        with engine.connect() as conn:
+            if inspect(conn).has_table("schema_version"):
+                raise
+        raise RuntimeError("Schema version table missing; run `python migrations.py upgrade`")
+    if version < SCHEMA_VERSION:
+        raise RuntimeError(f"Schema is at version {version}, expected {SCHEMA_VERSION}; run `python migrations.py upgrade`")
+
+
+# ---------------- Command ----------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply or inspect database schema migrations")
+    parser.add_argument("command", choices=("upgrade", "current"))
+    parser.add_argument("--url", default=DATABASE_URL)
+    args = parser.parse_args()
+
+    engine = create_engine(args.url)
+    if args.command == "upgrade":
+        upgrade(engine)
+    else:
+        with engine.connect() as conn:
+            version = current_version(conn) if inspect(conn).has_table("schema_version") else 0
+        print(f"current {version}, latest {SCHEMA_VERSION}")
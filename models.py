@@ -0,0 +1,92 @@
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Integer, String
+from sqlalchemy.orm import declarative_base
+
+Base = declarative_base()
+
+
+# ---------------- Instagram-like API (main.py) ----------------
+class User(Base):
+    __tablename__ = "users"
+    id = Column(Integer, primary_key=True)
+    username = Column(String(150), nullable=False)
+    email = Column(String(255), nullable=False, unique=True)
+    password = Column(String(255), nullable=False)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+
+class Post(Base):
+    __tablename__ = "posts"
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, nullable=False)
+    title = Column(String(300), nullable=True)
+    content = Column(String(2000), nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+
+class Follow(Base):
+    __tablename__ = "follows"
+    id = Column(Integer, primary_key=True)
+    followed_by = Column(Integer, nullable=False)
+    followed_to = Column(Integer, nullable=False)
+
+
+class Block(Base):
+    __tablename__ = "blocks"
+    id = Column(Integer, primary_key=True)
+    block_by = Column(Integer, nullable=False)
+    block_to = Column(Integer, nullable=False)
+
+
+class Like(Base):
+    __tablename__ = "likes"
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, nullable=False)
+    post_id = Column(Integer, nullable=False)
+
+
+# ---------------- Register API (main1.py, main2.py) ----------------
+class Register(Base):
+    __tablename__ = "UserRegister"
+    user_id = Column(Integer, primary_key=True)
+    name = Column(String(100), nullable=False)
+    email = Column(String(200), nullable=False, unique=True)
+    password = Column(String(255), nullable=False)
+    otp = Column(Integer, nullable=True)
+
+
+class PostUser(Base):
+    __tablename__ = "PostUser"
+    post_id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, nullable=False)
+    title = Column(String(1000), nullable=False)
+    content = Column(String(500), nullable=False)
+
+
+class FollowUser(Base):
+    __tablename__ = "FollowUser"
+    follow_id = Column(Integer, primary_key=True)
+    follow_by = Column(Integer, nullable=False)
+    follow_to = Column(Integer, nullable=False)
+
+
+class BlockUser(Base):
+    __tablename__ = "BlockUser"
+    block_id = Column(Integer, primary_key=True)
+    block_by = Column(Integer, nullable=False)
+    block_to = Column(Integer, nullable=False)
+
+
+class LikeUser(Base):
+    __tablename__ = "LikeUser"
+    like_id = Column(Integer, primary_key=True)
+    like_by = Column(Integer, nullable=False)
+    like_to = Column(Integer, nullable=False)
+
+
+class Otp(Base):
+    __tablename__ = "otpdata"
+    id = Column(Integer, primary_key=True)
+    email = Column(String(), nullable=False)
+    otp = Column(Integer, nullable=False)
@@ -0,0 +1,280 @@
+import contextvars
+import functools
+import hashlib
+import hmac
+import inspect
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+from fastapi.routing import APIRoute
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger("profiling")
+
+# ---------------- Configuration ----------------
+# Fraction of requests to profile; 0 disables sampling.
+PROFILE_RATE = float(os.getenv("PROFILE_RATE", "0"))
+# Requests carrying a valid signed X-Profile header are always profiled.
+PROFILE_SECRET = os.getenv("PROFILE_SECRET", "")
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "200"))
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.002"))
+SIGNATURE_TTL = 300
+
+_current = contextvars.ContextVar("profile", default=None)
+
+
+def enabled() -> bool:
+    return PROFILE_RATE > 0 or bool(PROFILE_SECRET)
+
+
+# ---------------- Signed header ----------------
+def sign(path: str, secret: str = None, now: float = None) -> str:
+    secret = secret or PROFILE_SECRET
+    ts = str(int(now if now is not None else time.time()))
+    mac = hmac.new(secret.encode(), f"{ts}:{path}".encode(), hashlib.sha256).hexdigest()
+    return f"{ts}:{mac}"
+
+
+def _valid_signature(value: str, path: str) -> bool:
+    ts, _, _ = value.partition(":")
+    if not PROFILE_SECRET or not ts.isdigit() or abs(time.time() - int(ts)) > SIGNATURE_TTL:
+        return False
+    return hmac.compare_digest(value, sign(path, now=int(ts)))
+
+
+# ---------------- Per-request profile ----------------
+class RequestProfile:
+    def __init__(self, method: str, path: str):
+        self.root = f"{method} {path}"
+        self.stacks = Counter()
+        self.sql = {}
+        self.sql_time = 0.0
+        self.sql_count = 0
+        self.lock = threading.Lock()
+
+    def collapsed(self) -> str:
+        lines = [f"{stack} {count}" for stack, count in self.stacks.most_common()]
+        return "\n".join(lines) + "\n"
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class _Sampler:
+    # One daemon thread samples the stacks of every thread currently running
+    # a profiled endpoint. It only runs while such a request is in flight.
+    def __init__(self):
+        self.active = {}
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.thread = None
+
+    def add(self, ident: int, profile: RequestProfile, replace: bool = True) -> bool:
+        # Returns False when replace is off and the thread is already sampled.
+        with self.lock:
+            if not replace and ident in self.active:
+                return False
+            self.active[ident] = profile
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name="profile-sampler", daemon=True)
+                self.thread.start()
+            self.wake.set()
+            return True
+
+    def remove(self, ident: int):
+        # Once this returns the sampler no longer touches the profile.
+        with self.lock:
+            self.active.pop(ident, None)
+
+    def run(self):
+        while True:
+            with self.lock:
+                if not self.active:
+                    self.wake.clear()
+            self.wake.wait()
+            frames = sys._current_frames()
+            with self.lock:
+                for ident, profile in self.active.items():
+                    frame = frames.get(ident)
+                    if frame is None:
+                        continue
+                    names = []
+                    while frame is not None:
+                        names.append(_frame_name(frame))
+                        frame = frame.f_back
+                    names.append(profile.root)
+                    stack = ";".join(reversed(names))
+                    statement = profile.sql.get(ident)
+                    if statement:
+                        stack += f";[sql] {statement}"
+                    profile.stacks[stack] += 1
+            del frames
+            time.sleep(PROFILE_INTERVAL)
+
+
+_sampler = _Sampler()
+
+
+def _profiled(fn):
+    # Wraps a callable so that, when the current request was selected by the
+    # middleware, the thread running it is sampled. Nested wrappers on the
+    # same thread leave the registration to the outermost one.
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            profile = _current.get()
+            if profile is None:
+                return await fn(*args, **kwargs)
+            ident = threading.get_ident()
+            added = _sampler.add(ident, profile, replace=False)
+            try:
+                return await fn(*args, **kwargs)
+            finally:
+                if added:
+                    _sampler.remove(ident)
+    else:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            profile = _current.get()
+            if profile is None:
+                return fn(*args, **kwargs)
+            ident = threading.get_ident()
+            added = _sampler.add(ident, profile, replace=False)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                if added:
+                    _sampler.remove(ident)
+    return wrapper
+
+
+class ProfiledRoute(APIRoute):
+    # The whole route handler is sampled on the event loop thread: dependency
+    # resolution, the endpoint call and response serialization. A sync
+    # endpoint and the response_model validation FastAPI runs for it each
+    # execute in a threadpool thread, so those are wrapped as well.
+    def __init__(self, path, endpoint, **kwargs):
+        super().__init__(path, _profiled(endpoint), **kwargs)
+
+    def get_route_handler(self):
+        field = self.response_field
+        if field is not None and not getattr(field, "_profiled", False):
+            field.validate = _profiled(field.validate)
+            field._profiled = True
+        return _profiled(super().get_route_handler())
+
+
+# ---------------- SQL attribution ----------------
+# Timing state lives on the execution context, which is discarded with the
+# statement, so a failed execute cannot leak a start time into later requests.
+# Statements run from other threads of the request (shard scatter-gather)
+# register those threads with the sampler while they execute.
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _current.get()
+    if profile is not None and context is not None:
+        ident = threading.get_ident()
+        context._profile_start = time.perf_counter()
+        context._profile_sampled = _sampler.add(ident, profile, replace=False)
+        profile.sql[ident] = " ".join(statement.split()[:4])
+
+
+def _finish(context):
+    profile = _current.get()
+    start = getattr(context, "_profile_start", None)
+    if profile is None or start is None:
+        return
+    ident = threading.get_ident()
+    context._profile_start = None
+    with profile.lock:
+        profile.sql_time += time.perf_counter() - start
+        profile.sql_count += 1
+    profile.sql.pop(ident, None)
+    if context._profile_sampled:
+        _sampler.remove(ident)
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    _finish(context)
+
+
+def _handle_error(exception_context):
+    _finish(exception_context.execution_context)
+
+
+# ---------------- Ring buffer ----------------
+def _write(profile: RequestProfile, elapsed: float):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    slug = "".join(c if c.isalnum() else "_" for c in profile.root).strip("_")
+    name = f"{time.time_ns()}-{os.getpid()}-{slug}-{elapsed * 1000:.0f}ms-sql{profile.sql_time * 1000:.0f}ms.collapsed"
+    with open(os.path.join(PROFILE_DIR, name), "w") as f:
+        f.write(profile.collapsed())
+    files = sorted(os.listdir(PROFILE_DIR))
+    for old in files[:max(0, len(files) - PROFILE_MAX_FILES)]:
+        try:
+            os.remove(os.path.join(PROFILE_DIR, old))
+        except FileNotFoundError:
+            pass
+
+
+def _write_logged(profile: RequestProfile, elapsed: float):
+    # A failed write must never replace the request's own outcome.
+    try:
+        _write(profile, elapsed)
+    except Exception:
+        logger.exception("failed to write profile for %s", profile.root)
+
+
+# ---------------- Middleware ----------------
+class ProfilingMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    def _selected(self, scope) -> bool:
+        if PROFILE_SECRET:
+            for key, value in scope["headers"]:
+                if key == b"x-profile":
+                    return _valid_signature(value.decode("latin-1"), scope["path"])
+        return PROFILE_RATE > 0 and random.random() < PROFILE_RATE
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._selected(scope):
+            return await self.app(scope, receive, send)
+        profile = RequestProfile(scope["method"], scope["path"])
+        token = _current.set(profile)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _current.reset(token)
+            if profile.stacks:
+                # File I/O and directory pruning stay off the event loop.
+                await run_in_threadpool(_write_logged, profile, time.perf_counter() - start)
+
+
+def install(app):
+    # Must run before any route is declared. When profiling is disabled
+    # nothing is installed, so requests pay no overhead at all.
+    if not enabled():
+        return
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+
+    app.router.route_class = ProfiledRoute
+    app.add_middleware(ProfilingMiddleware)
+    event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(Engine, "handle_error", _handle_error)
+
+
+if __name__ == "__main__":
+    # Prints an X-Profile header value for a path, e.g.
+    #   curl -H "X-Profile: $(PROFILE_SECRET=... python profiling.py /followers/1)" ...
+    print(sign(sys.argv[1]))
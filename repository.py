@@ -0,0 +1,115 @@
+from sqlalchemy import and_, bindparam, literal, or_, select
+from sqlalchemy.orm import Session
+
+from models import Block, BlockUser, Follow, FollowUser, Like, LikeUser, Post, PostUser, Register, User
+
+# ---------------- Cached statements ----------------
+# Every hot lookup is built once at import with bind parameters instead of a
+# new Query per call. The statement objects are reused, so SQLAlchemy finds
+# their compiled SQL in the engine's compiled cache and a lookup only binds
+# values and executes.
+_a, _b = bindparam("a"), bindparam("b")
+
+
+def _first(model, *criteria):
+    return select(model).where(*criteria).limit(1)
+
+
+def _exists(*criteria):
+    return select(literal(1)).where(*criteria).limit(1)
+
+
+def _either_way(by, to):
+    return _exists(or_(and_(by == _a, to == _b), and_(by == _b, to == _a)))
+
+
+_user_exists = _exists(User.id == _a)
+_user_by_id = _first(User, User.id == _a)
+_user_by_email = _first(User, User.email == _a)
+_post_by_id = _first(Post, Post.id == _a)
+_follow = _first(Follow, Follow.followed_by == _a, Follow.followed_to == _b)
+_like = _first(Like, Like.user_id == _a, Like.post_id == _b)
+_block = _first(Block, Block.block_by == _a, Block.block_to == _b)
+_blocked = _either_way(Block.block_by, Block.block_to)
+
+_register_by_id = _first(Register, Register.user_id == _a)
+_register_by_email = _first(Register, Register.email == _a)
+_post_user_by_id = _first(PostUser, PostUser.post_id == _a)
+_follow_user = _first(FollowUser, FollowUser.follow_by == _a, FollowUser.follow_to == _b)
+_like_user = _first(LikeUser, LikeUser.like_by == _a, LikeUser.like_to == _b)
+_block_user = _first(BlockUser, BlockUser.block_by == _a, BlockUser.block_to == _b)
+_user_blocked = _either_way(BlockUser.block_by, BlockUser.block_to)
+
+
+def _params(a, b):
+    return {"a": a} if b is None else {"a": a, "b": b}
+
+
+def _get(db: Session, stmt, a, b=None):
+    return db.execute(stmt, _params(a, b)).scalars().first()
+
+
+def _check(db: Session, stmt, a, b=None) -> bool:
+    return db.execute(stmt, _params(a, b)).first() is not None
+
+
+# ---------------- Instagram-like API (main.py) ----------------
+def user_exists(db: Session, user_id: int) -> bool:
+    return _check(db, _user_exists, user_id)
+
+
+def user_by_id(db: Session, user_id: int):
+    return _get(db, _user_by_id, user_id)
+
+
+def user_by_email(db: Session, email: str):
+    return _get(db, _user_by_email, email)
+
+
+def post_by_id(db: Session, post_id: int):
+    return _get(db, _post_by_id, post_id)
+
+
+def get_follow(db: Session, followed_by: int, followed_to: int):
+    return _get(db, _follow, followed_by, followed_to)
+
+
+def get_like(db: Session, user_id: int, post_id: int):
+    return _get(db, _like, user_id, post_id)
+
+
+def get_block(db: Session, block_by: int, block_to: int):
+    return _get(db, _block, block_by, block_to)
+
+
+def is_blocked(db: Session, a: int, b: int) -> bool:
+    return _check(db, _blocked, a, b)
+
+
+# ---------------- Register API (main1.py, main2.py) ----------------
+def register_by_id(db: Session, user_id: int):
+    return _get(db, _register_by_id, user_id)
+
+
+def register_by_email(db: Session, email: str):
+    return _get(db, _register_by_email, email)
+
+
+def post_user_by_id(db: Session, post_id: int):
+    return _get(db, _post_user_by_id, post_id)
+
+
+def get_follow_user(db: Session, follow_by: int, follow_to: int):
+    return _get(db, _follow_user, follow_by, follow_to)
+
+
+def get_like_user(db: Session, like_by: int, like_to: int):
+    return _get(db, _like_user, like_by, like_to)
+
+
+def get_block_user(db: Session, block_by: int, block_to: int):
+    return _get(db, _block_user, block_by, block_to)
+
+
+def is_user_blocked(db: Session, a: int, b: int) -> bool:
+    return _check(db, _user_blocked, a, b)
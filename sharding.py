@@ -0,0 +1,236 @@
+import argparse
+import contextvars
+import importlib
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from sqlalchemy import create_engine, delete, insert, inspect, select, tuple_
+from sqlalchemy.orm import sessionmaker
+
+import database
+from database import DATABASE_URL
+
+# ---------------- Configuration ----------------
+# Shard map: comma-separated database URLs, shard i is the i-th URL. Order
+# matters, so new shards are appended. Without it the main database is the
+# only shard, e.g. for local testing:
+#   SHARD_URLS=sqlite:///shard0.db,sqlite:///shard1.db,sqlite:///shard2.db
+SHARD_URLS = [u.strip() for u in os.getenv("SHARD_URLS", DATABASE_URL).split(",") if u.strip()]
+# Threads shared by all concurrent scatter-gathers in the process. The
+# calling thread queries one shard itself, so a request needs len(shards) - 1.
+SCATTER_WORKERS = int(os.getenv("SCATTER_WORKERS", "32"))
+
+
+# ---------------- Hashing ----------------
+def jump_hash(key: int, buckets: int) -> int:
+    # Jump consistent hash: growing from N to N+1 shards moves only ~1/(N+1)
+    # of the keys, which keeps rebalancing cheap.
+    key &= 0xFFFFFFFFFFFFFFFF
+    b, j = -1, 0
+    while j < buckets:
+        b = j
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        j = int((b + 1) * (float(1 << 31) / float((key >> 33) + 1)))
+    return b
+
+
+# ---------------- Router ----------------
+class ShardRouter:
+    def __init__(self, urls):
+        if not urls:
+            raise ValueError("At least one shard URL is required")
+        self.urls = list(urls)
+        # create_engine does not connect, so every engine is built up front
+        # and the router is read-only afterwards. A shard on the main
+        # database shares its engine and pool, so a request holding get_db
+        # and an edge session does not take a second pool.
+        self._engines = [database.engine if url == DATABASE_URL else create_engine(url) for url in self.urls]
+        self._sessionmakers = [sessionmaker(bind=engine, autoflush=False, autocommit=False) for engine in self._engines]
+        self._pool = ThreadPoolExecutor(max_workers=SCATTER_WORKERS, thread_name_prefix="scatter") if len(self.urls) > 1 else None
+
+    def __len__(self):
+        return len(self.urls)
+
+    def shard_for(self, key: int) -> int:
+        return jump_hash(int(key), len(self.urls))
+
+    def engine_at(self, index: int):
+        return self._engines[index]
+
+    @contextmanager
+    def session_at(self, index: int):
+        db = self._sessionmakers[index]()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    def session(self, key: int):
+        return self.session_at(self.shard_for(key))
+
+    def scatter_gather(self, fn):
+        # Runs fn(session) on every shard and concatenates the returned lists.
+        def run(index):
+            with self.session_at(index) as db:
+                return list(fn(db))
+        if self._pool is None:
+            return run(0)
+        # Shard 0 runs in the calling thread, the rest in the pool. Each pool
+        # query runs in the caller's context so contextvars such as the
+        # active request profile carry into the pool threads.
+        futures = [self._pool.submit(contextvars.copy_context().run, run, index) for index in range(1, len(self.urls))]
+        results = run(0)
+        for future in futures:
+            results.extend(future.result())
+        return results
+
+
+# ---------------- Shard maintenance ----------------
+def init_shards(router: ShardRouter, edges):
+    for index in range(len(router)):
+        engine = router.engine_at(index)
+        for model, _ in edges:
+            model.__table__.create(bind=engine, checkfirst=True)
+
+
+def _natural_columns(model):
+    return [c for c in model.__table__.columns if not c.primary_key]
+
+
+def rebalance(old: ShardRouter, new: ShardRouter, edges, batch_size: int = 1000):
+    # Copies each edge whose shard changed under the new map, then deletes it
+    # from the old shard. Copies skip rows already present on the target, so
+    # an interrupted run can simply be restarted.
+    #
+    # The apps read with a single shard map, so edges being moved are missing
+    # under either map until the run finishes. Rebalance in a maintenance
+    # window with the apps stopped, then restart them with SHARD_URLS set to the new map.
+    moved = 0
+    for model, key in edges:
+        pk = inspect(model).primary_key[0]
+        columns = _natural_columns(model)
+        for index, url in enumerate(old.urls):
+            last = None
+            while True:
+                with old.session_at(index) as src:
+                    stmt = select(model).order_by(pk).limit(batch_size)
+                    if last is not None:
+                        stmt = stmt.where(pk > last)
+                    rows = src.execute(stmt).scalars().all()
+                    if not rows:
+                        break
+                    last = getattr(rows[-1], pk.key)
+                    by_target = {}
+                    for row in rows:
+                        target = new.shard_for(getattr(row, key))
+                        if new.urls[target] != url:
+                            by_target.setdefault(target, []).append(row)
+                    # One existence check and one insert per target shard.
+                    for target, group in by_target.items():
+                        values = {tuple(getattr(r, c.key) for c in columns) for r in group}
+                        with new.session_at(target) as dst:
+                            present = {tuple(r) for r in dst.execute(select(*columns).where(tuple_(*columns).in_(list(values))))}
+                            missing = [dict(zip((c.key for c in columns), v)) for v in values - present]
+                            if missing:
+                                dst.execute(insert(model.__table__), missing)
+                            dst.commit()
+                        src.execute(delete(model.__table__).where(pk.in_([getattr(r, pk.key) for r in group])))
+                        moved += len(group)
+                    src.commit()
+    return moved
+
+
+# ---------------- Self-check ----------------
+# Pinned so a change to jump_hash, which would silently move edges between
+# shards, fails the check.
+JUMP_HASH_PINNED = {(1, 3): 0, (42, 8): 2, (2 ** 40 + 7, 16): 12, (123456789, 1000): 294}
+
+
+def self_check(keys: int = 2000):
+    # Routing, scatter-gather and rebalance against throwaway SQLite shards.
+    from models import Follow
+
+    for (key, buckets), expected in JUMP_HASH_PINNED.items():
+        assert jump_hash(key, buckets) == expected, (key, buckets)
+    for key in range(keys):
+        for n in range(1, 10):
+            before, after = jump_hash(key, n), jump_hash(key, n + 1)
+            assert 0 <= before < n
+            # Growing the map only ever moves a key to the new shard.
+            assert after in (before, n), (key, n)
+
+    edges = [(Follow, "followed_by")]
+    with tempfile.TemporaryDirectory() as tmp:
+        urls = [f"sqlite:///{os.path.join(tmp, f'shard{i}.db')}" for i in range(4)]
+        old, new = ShardRouter(urls[:3]), ShardRouter(urls)
+        try:
+            init_shards(old, edges)
+            init_shards(new, edges)
+            for key in range(keys):
+                with old.session(key) as db:
+                    db.add(Follow(followed_by=key, followed_to=key + 1))
+                    db.commit()
+            for index in range(len(old)):
+                with old.session_at(index) as db:
+                    assert all(old.shard_for(k) == index for k in db.execute(select(Follow.followed_by)).scalars())
+
+            gathered = old.scatter_gather(lambda db: db.execute(select(Follow.followed_by)).scalars())
+            assert sorted(gathered) == list(range(keys))
+
+            moved = rebalance(old, new, edges, batch_size=97)
+            expected = sum(1 for k in range(keys) if new.shard_for(k) != old.shard_for(k))
+            assert moved == expected, (moved, expected)
+            assert rebalance(old, new, edges, batch_size=97) == 0
+            counts = [0] * len(new)
+            for index in range(len(new)):
+                with new.session_at(index) as db:
+                    rows = db.execute(select(Follow.followed_by)).scalars().all()
+                assert all(new.shard_for(k) == index for k in rows)
+                counts[index] = len(rows)
+            assert sum(counts) == keys, counts
+            assert sorted(new.scatter_gather(lambda db: db.execute(select(Follow.followed_by)).scalars())) == list(range(keys))
+        finally:
+            for router in (old, new):
+                if router._pool is not None:
+                    router._pool.shutdown()
+                for engine in router._engines:
+                    engine.dispose()
+    print(f"ok: {keys} keys, moved {moved} of them from 3 to 4 shards, per-shard counts {counts}")
+
+
+def _parse_urls(value: str):
+    return [u.strip() for u in value.split(",") if u.strip()]
+
+
+# ---------------- Command ----------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the follow/like edge shards")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    init = sub.add_parser("init", help="create the edge tables on every shard")
+    init.add_argument("--app", required=True, help="app module defining SHARDED_EDGES, e.g. main or main2")
+    init.add_argument("--shards", default=",".join(SHARD_URLS))
+
+    move = sub.add_parser("rebalance", help="move edges from one shard map to another; run with the apps stopped")
+    move.add_argument("--app", required=True, help="app module defining SHARDED_EDGES, e.g. main or main2")
+    move.add_argument("--from", dest="old", required=True, help="current comma-separated shard URLs")
+    move.add_argument("--to", dest="new", required=True, help="target comma-separated shard URLs")
+    move.add_argument("--batch-size", type=int, default=1000)
+
+    sub.add_parser("check", help="exercise routing, scatter-gather and rebalance on temporary SQLite shards")
+
+    args = parser.parse_args()
+    if args.command == "check":
+        self_check()
+        raise SystemExit
+    edges = importlib.import_module(args.app).SHARDED_EDGES
+
+    if args.command == "init":
+        init_shards(ShardRouter(_parse_urls(args.shards)), edges)
+    else:
+        target = ShardRouter(_parse_urls(args.new))
+        init_shards(target, edges)
+        moved = rebalance(ShardRouter(_parse_urls(args.old)), target, edges, args.batch_size)
+        print(f"moved {moved} edges")